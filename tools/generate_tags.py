@@ -8,12 +8,13 @@ This updates VALID_BOORU_TAGS, TAG_ALIASES, BACKGROUND_TAGS, LOCATION_TAGS,
 ATMOSPHERE_TAGS, and TIME_TAGS.
 
 Usage:
-    python3 tools/generate_tags.py [--csv PATH] [--threshold N] [--dry-run]
+    python3 tools/generate_tags.py [--csv PATH] [--threshold N] [--dry-run] [--no-cache]
 
 Arguments:
     --csv PATH       Path to danbooru CSV file (default: /home/gc/Downloads/TAGS/danbooru_2024-12-22_pt25-ia-dd.csv)
     --threshold N    Minimum post count for tag inclusion (default: 100)
     --dry-run        Print stats without modifying index.js
+    --no-cache       Re-parse the CSV even if a cached result exists
 
 CSV Format (no header):
     tag_name,type,count,"alias1,alias2,..."
@@ -37,6 +38,14 @@ What it modifies in index.js:
     replaces everything between the opening and closing delimiters.
 
 Notes:
+    - If pyarrow is installed, the CSV is parsed with its multithreaded reader;
+      failing that, with pandas' C reader. Otherwise the file is memory-mapped
+      (or streamed, if it can't be mapped) and scanned byte-wise, rejecting
+      non-type-0 rows before they are decoded; files larger than 64 MiB are
+      split into byte ranges scanned by a process pool.
+    - The filtered tags are cached under $XDG_CACHE_HOME (~/.cache by
+      default), keyed on the CSV's path, mtime and size, so re-runs with the
+      same CSV skip the parse.
     - All persistence tag candidates are hardcoded in this script.
       Only candidates that exist in the generated VALID_BOORU_TAGS are included.
     - The script preserves all code before and after the tag data sections.
@@ -44,67 +53,538 @@ Notes:
       6 per line for persistence tags.
 """
 
+import concurrent.futures
 import csv
+import gc
+import hashlib
+import io
+import mmap
+import os
+import pickle
+import shutil
+import stat
+import struct
 import sys
+import warnings
 import argparse
 
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pa_csv
+except ImportError:
+    pa = None
+
+try:
+    import pandas as pd
+except ImportError:
+    pd = None
+
 DEFAULT_CSV = "/home/gc/Downloads/TAGS/danbooru_2024-12-22_pt25-ia-dd.csv"
 INDEX_JS_PATH = "/home/gc/Github/Image-gen-kazuma/index.js"
+CSV_CHUNK_ROWS = 1_000_000
+CSV_BLOCK_SIZE = 8 << 20
+CSV_READ_BUFFER_SIZE = 4 << 20
+CSV_PARALLEL_CHUNK_SIZE = 64 << 20
+ARROW_SKIPPED_ROWS_LIMIT = 1000
+OUTPUT_BUFFER_SIZE = 1 << 20
+CACHE_VERSION = 3
+TAGS_PER_LINE = 8
+PERSISTENCE_TAGS_PER_LINE = 6
+
+# Sections of index.js that get regenerated: name -> (opener after
+# 'const NAME = ', closing delimiter). Each delimiter sits on its own line.
+SECTION_DELIMITERS = {
+    'VALID_BOORU_TAGS': ('new Set([', ']);'),
+    'BACKGROUND_TAGS': ('new Set([', ']);'),
+    'LOCATION_TAGS': ('new Set([', ']);'),
+    'ATMOSPHERE_TAGS': ('new Set([', ']);'),
+    'TIME_TAGS': ('new Set([', ']);'),
+    'TAG_ALIASES': ('{', '};'),
+}
+
+# Plain header at the start of a cache file: magic, CACHE_VERSION, and the
+# CSV's mtime_ns, size and the threshold. It is compared before anything in
+# the file is unpickled.
+_CACHE_HEADER = struct.Struct('<4sIqqq')
+
+# str.translate table for escape_js_string: backslash and single quote
+_JS_ESCAPE = str.maketrans({'\\': '\\\\', "'": "\\'"})
+
+
+def parse_csv(csv_path, threshold, use_cache=True):
+    """
+    Parse the danbooru CSV and return type-0 tags with count >= threshold,
+    as {tag_name: (count, [aliases])}.
 
+    The result is cached in the user's cache directory (see _load_cache) so
+    repeated runs with the same file and threshold skip the parse entirely.
+    """
+    if use_cache:
+        tags = _load_cache(csv_path, threshold)
+        if tags is not None:
+            return tags
+
+    if pa is not None:
+        tags = _parse_csv_arrow(csv_path, threshold)
+    elif pd is not None:
+        tags = _parse_csv_pandas(csv_path, threshold)
+    else:
+        tags = _parse_csv_python(csv_path, threshold)
+
+    if use_cache:
+        _save_cache(csv_path, threshold, tags)
+    return tags
 
-def parse_csv(csv_path, threshold):
-    """Parse the danbooru CSV and return type-0 tags with count >= threshold."""
-    tags = {}  # tag_name -> {'count': int, 'aliases': [str]}
 
-    with open(csv_path, 'r', encoding='utf-8') as f:
-        reader = csv.reader(f)
-        for row in reader:
-            if len(row) < 3:
-                continue
-            tag_name = row[0]
+def _cache_path(csv_path, threshold):
+    # Kept in a per-user directory rather than next to the CSV, so a cache
+    # file shipped alongside a downloaded CSV is never unpickled
+    cache_dir = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')
+    path_hash = hashlib.sha256(os.fsencode(os.path.abspath(csv_path))).hexdigest()[:16]
+    name = f"{os.path.basename(csv_path)}.{path_hash}.t{threshold}.pkl"
+    return os.path.join(cache_dir, 'vn-background-generator', name)
+
+
+def _cache_key(csv_path, threshold):
+    """Identify the CSV contents the cache was built from, or None if uncacheable."""
+    try:
+        st = os.stat(csv_path)
+    except OSError:
+        return None
+    if not stat.S_ISREG(st.st_mode):
+        return None
+    try:
+        return _CACHE_HEADER.pack(b'VNBG', CACHE_VERSION, st.st_mtime_ns, st.st_size, threshold)
+    except struct.error:
+        return None  # threshold out of range
+
+
+def _load_cache(csv_path, threshold):
+    """Return the cached tags for this CSV and threshold, or None on a miss."""
+    key = _cache_key(csv_path, threshold)
+    if key is None:
+        return None
+    try:
+        with open(_cache_path(csv_path, threshold), 'rb') as f:
+            if f.read(len(key)) != key:
+                return None
+            # Unpickling allocates one tuple and list per tag, which would
+            # otherwise trigger repeated collections over the growing dict.
+            gc_was_enabled = gc.isenabled()
+            gc.disable()
             try:
-                tag_type = int(row[1])
-                tag_count = int(row[2])
-            except (ValueError, IndexError):
-                continue
+                return pickle.load(f)
+            finally:
+                if gc_was_enabled:
+                    gc.enable()
+    except Exception:
+        # Any unreadable cache (truncated, newer pickle protocol, ...) is
+        # just a miss
+        return None
+
+
+def _save_cache(csv_path, threshold, tags):
+    """Write the parsed tags to the cache; failures only cost the next run a parse."""
+    key = _cache_key(csv_path, threshold)
+    if key is None:
+        return
+    cache_path = _cache_path(csv_path, threshold)
+    tmp_path = cache_path + ".tmp"
+    try:
+        os.makedirs(os.path.dirname(cache_path), mode=0o700, exist_ok=True)
+        with open(tmp_path, 'wb') as f:
+            f.write(key)
+            pickle.dump(tags, f, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        print(f"Warning: could not write parse cache {cache_path}: {e}", file=sys.stderr)
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _parse_csv_arrow(csv_path, threshold):
+    """Parse the CSV with pyarrow, which tokenizes blocks on all cores."""
+    if not stat.S_ISREG(os.stat(csv_path).st_mode):
+        # pyarrow seeks its input, which pipes and other special files don't
+        # support
+        return _parse_csv_python(csv_path, threshold)
+
+    columns = ['tag', 'type', 'count', 'aliases']
+    # Rows without exactly four columns (e.g. no aliases column) are set aside
+    # by the reader and parsed with the csv module afterwards. Each one costs a
+    # Python callback, so past ARROW_SKIPPED_ROWS_LIMIT the read is aborted
+    # and the file handed to the stdlib scanner instead.
+    skipped_rows = []
+
+    def skip_row(row):
+        if len(skipped_rows) >= ARROW_SKIPPED_ROWS_LIMIT:
+            return 'error'
+        skipped_rows.append(row.text)
+        return 'skip'
+
+    try:
+        table = pa_csv.read_csv(
+            csv_path,
+            read_options=pa_csv.ReadOptions(column_names=columns, block_size=CSV_BLOCK_SIZE),
+            parse_options=pa_csv.ParseOptions(invalid_row_handler=skip_row),
+            convert_options=pa_csv.ConvertOptions(
+                column_types={c: pa.string() for c in columns},
+                strings_can_be_null=False,
+                quoted_strings_can_be_null=False,
+            ),
+        )
+    except pa.ArrowInvalid:
+        # Too many skipped rows, or an empty file, which pyarrow rejects
+        # outright; the stdlib scanner returns {} for it like the baseline
+        return _parse_csv_python(csv_path, threshold)
+    # type/count are read as strings so a malformed value drops its row
+    # instead of failing the whole read
+    table = table.filter(pc.and_(
+        pc.equal(table['type'], '0'),
+        # ASCII digits only: utf8_is_digit also accepts e.g. '²', which int() rejects
+        pc.match_substring_regex(table['count'], r'^[0-9]+$'),
+    ))
+    table = table.set_column(2, 'count', pc.cast(table['count'], pa.int64()))
+    table = table.filter(pc.greater_equal(table['count'], threshold))
+
+    tags = {}  # tag_name -> (count, [aliases])
+    for tag_name, count, raw_aliases in zip(
+        table['tag'].to_pylist(),
+        table['count'].to_pylist(),
+        pc.split_pattern(table['aliases'], ',').to_pylist(),
+    ):
+        aliases = [a.strip() for a in raw_aliases if a.strip()]
+        tags[tag_name] = (count, aliases)
+
+    # The reader doesn't report where skipped rows were, so they can only be
+    # merged in when their position can't matter: a name seen nowhere else,
+    # and no aliases that could clash with another tag's. Otherwise fall back
+    # to a scanner that sees every row in file order.
+    for row in csv.reader(skipped_rows):
+        entry = _parse_row(row, threshold)
+        if entry is None:
+            continue
+        if entry[0] in tags or entry[2]:
+            return _parse_csv_python(csv_path, threshold)
+        tags[entry[0]] = entry[1:]
+
+    return tags
+
+
+def _parse_csv_pandas(csv_path, threshold):
+    """Parse the CSV in chunks with pandas' C reader."""
+    reader = pd.read_csv(
+        csv_path,
+        header=None,
+        names=['tag', 'type', 'count', 'aliases'],
+        # Rows without an aliases column get '' there. index_col=False stops a
+        # first row with extra fields from turning the tag column into the
+        # index; it is truncated to four fields instead.
+        index_col=False,
+        # type/count stay text so they can be checked exactly as the other
+        # parsers do: numeric inference would also accept '00', '+150' or
+        # '150.0'
+        dtype=object,
+        engine='c',
+        na_filter=False,
+        chunksize=CSV_CHUNK_ROWS,
+    )
+    tags = {}  # tag_name -> (count, [aliases])
+    try:
+        with reader, warnings.catch_warnings():
+            warnings.simplefilter('ignore', pd.errors.ParserWarning)
+            for chunk in reader:
+                # Drop non-type-0 rows vectorized; only the rest reach Python
+                chunk = chunk[chunk['type'] == '0']
+                for tag_name, count, raw_aliases in zip(
+                    chunk['tag'].tolist(), chunk['count'].tolist(), chunk['aliases'].tolist()
+                ):
+                    if not (count.isascii() and count.isdigit()):
+                        continue
+                    count = int(count)
+                    if count < threshold:
+                        continue
+                    aliases = [a.strip() for a in raw_aliases.split(',') if a.strip()]
+                    tags[tag_name] = (count, aliases)
+    except pd.errors.ParserError:
+        # A row after the first with more than four fields; the stdlib scanner
+        # keeps its first four like the baseline did
+        return _parse_csv_python(csv_path, threshold)
+
+    return tags
+
+
+def _parse_csv_python(csv_path, threshold):
+    """Pure-Python fallback for parse_csv, used when pyarrow and pandas are unavailable."""
+    try:
+        size = os.path.getsize(csv_path)
+    except OSError:
+        size = 0
+    if size > CSV_PARALLEL_CHUNK_SIZE and (os.cpu_count() or 1) > 1:
+        return _parse_csv_parallel(csv_path, threshold, size)
+
+    with open(csv_path, 'rb', buffering=CSV_READ_BUFFER_SIZE) as f:
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            # Empty files and special files (pipes, etc.) can't be mapped;
+            # scan the buffered stream instead
+            return _scan_csv_lines(f, threshold)
+        with mm:
+            if hasattr(mm, 'madvise') and hasattr(mmap, 'MADV_SEQUENTIAL'):
+                mm.madvise(mmap.MADV_SEQUENTIAL)
+            return _scan_csv_lines(iter(mm.readline, b''), threshold)
+
+
+def _parse_csv_parallel(csv_path, threshold, size):
+    """
+    Scan the CSV in newline-aligned byte ranges across worker processes.
+
+    Results are merged in file order, so later rows still win on duplicate tag
+    names exactly as in a sequential scan.
+    """
+    bounds = [0]
+    with open(csv_path, 'rb') as f:
+        while bounds[-1] < size:
+            f.seek(bounds[-1] + CSV_PARALLEL_CHUNK_SIZE)
+            f.readline()  # move to the start of the next line
+            bounds.append(min(f.tell(), size))
+
+    tags = {}
+    with concurrent.futures.ProcessPoolExecutor() as pool:
+        futures = [
+            pool.submit(_scan_csv_range, csv_path, threshold, start, end)
+            for start, end in zip(bounds, bounds[1:])
+        ]
+        for future in futures:
+            tags.update(future.result())
+    return tags
+
+
+def _scan_csv_range(csv_path, threshold, start, end):
+    """Worker for _parse_csv_parallel: scan bytes [start, end) of the CSV."""
+    with open(csv_path, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+    return _scan_csv_lines(io.BytesIO(data), threshold)
+
 
-            if tag_type != 0 or tag_count < threshold:
-                continue
+def _scan_csv_lines(lines, threshold):
+    """
+    Scan raw CSV lines (bytes) without decoding rejected rows.
 
-            aliases = []
-            if len(row) >= 4 and row[3].strip():
-                aliases = [a.strip() for a in row[3].split(',') if a.strip()]
+    Each line is split on its first three commas and rejected unless the type
+    column is exactly b'0'; the tag name, count and aliases are only decoded for
+    rows that survive. Rows with a quoted tag name are handed to the csv module.
+    """
+    tags = {}  # tag_name -> (count, [aliases])
+    for line in lines:
+        if line[:1] == b'"':
+            row = next(csv.reader([line.decode('utf-8')]), [])
+            entry = _parse_row(row, threshold)
+            if entry is not None:
+                tags[entry[0]] = entry[1:]
+            continue
+
+        parts = line.split(b',', 3)
+        if len(parts) < 3 or parts[1] != b'0':
+            continue
+        count_field = parts[2].rstrip(b'\r\n') if len(parts) == 3 else parts[2]
+        if not count_field.isdigit():
+            continue
+        tag_count = int(count_field)
+        if tag_count < threshold:
+            continue
+
+        aliases = []
+        if len(parts) == 4:
+            raw = parts[3].rstrip(b'\r\n')
+            if raw[:1] == b'"':
+                if raw.count(b'"') == 2 and raw[-1:] == b'"':
+                    # Plain quoted list: strip the quotes instead of running csv
+                    raw = raw[1:-1].decode('utf-8')
+                else:
+                    raw = next(csv.reader([raw.decode('utf-8')]))[0]
+            else:
+                raw = raw.split(b',', 1)[0].decode('utf-8')
+            if raw.strip():
+                aliases = [a.strip() for a in raw.split(',') if a.strip()]
 
-            tags[tag_name] = {'count': tag_count, 'aliases': aliases}
+        tags[parts[0].decode('utf-8')] = (tag_count, aliases)
 
     return tags
 
 
+def _parse_row(row, threshold):
+    """Return (tag_name, count, aliases) for a kept CSV row, or None."""
+    if len(row) < 3:
+        return None
+    tag_name = row[0]
+    try:
+        tag_type = int(row[1])
+        tag_count = int(row[2])
+    except (ValueError, IndexError):
+        return None
+
+    if tag_type != 0 or tag_count < threshold:
+        return None
+
+    aliases = []
+    if len(row) >= 4 and row[3].strip():
+        aliases = [a.strip() for a in row[3].split(',') if a.strip()]
+
+    return tag_name, tag_count, aliases
+
+
 def escape_js_string(s):
     """Escape a string for use in a JS single-quoted string."""
-    s = s.replace('\\', '\\\\')
-    s = s.replace("'", "\\'")
-    return s
+    if "'" not in s and "\\" not in s:
+        return s
+    return s.translate(_JS_ESCAPE)
 
 
 def format_tags_set(tag_names):
-    """Format tags as JavaScript Set entries, 8 per line."""
-    sorted_tags = sorted(tag_names)
-    lines = []
-    for i in range(0, len(sorted_tags), 8):
-        chunk = sorted_tags[i:i+8]
-        entries = ", ".join(f"'{escape_js_string(t)}'" for t in chunk)
-        lines.append(f"    {entries}")
-    return lines
+    """Format tags as the body of a JavaScript Set literal, 8 per line."""
+    return format_tags_set_sorted(sorted(tag_names))
+
+
+def format_tags_set_sorted(sorted_tags):
+    """Like format_tags_set, but for a tag list that is already sorted."""
+    return _format_set_body(sorted_tags, TAGS_PER_LINE)
+
+
+def format_persistence_set(tags_list):
+    """Format persistence tags as a JavaScript Set body, 6 per line, in list order."""
+    return _format_set_body(tags_list, PERSISTENCE_TAGS_PER_LINE)
+
+
+def _format_set_body(tags_list, per_line):
+    """Format quoted entries per_line to a line, indented, with a trailing newline."""
+    if not tags_list:
+        return ""
+    # Escape everything up front, then let the joins supply the quotes and
+    # separators instead of formatting each entry separately.
+    escaped = list(map(escape_js_string, tags_list))
+    rows = [
+        "', '".join(escaped[i:i+per_line])
+        for i in range(0, len(escaped), per_line)
+    ]
+    return "    '" + "',\n    '".join(rows) + "'\n"
 
 
 def format_aliases(aliases_dict):
-    """Format aliases as JavaScript object entries, sorted alphabetically."""
-    lines = []
-    for alias in sorted(aliases_dict.keys()):
-        canonical = aliases_dict[alias]
-        lines.append(f"    '{escape_js_string(alias)}': '{escape_js_string(canonical)}'")
-    return lines
+    """Format aliases as the body of a JavaScript object literal, sorted alphabetically."""
+    if not aliases_dict:
+        return ""
+    # Many aliases share a canonical tag, so escape each canonical tag once
+    escaped_canonical = {c: escape_js_string(c) for c in set(aliases_dict.values())}
+    return ",\n".join(
+        f"    '{escape_js_string(alias)}': '{escaped_canonical[canonical]}'"
+        for alias, canonical in sorted(aliases_dict.items())
+    ) + "\n"
+
+
+def _filter_candidates(candidates, candidate_set, valid_tags):
+    """
+    Return the candidates present in valid_tags, in candidate order.
+
+    valid_tags may be any set-like collection, including a dict's keys() view.
+    """
+    present = candidate_set & valid_tags
+    return [t for t in candidates if t in present]
+
+
+BACKGROUND_CANDIDATES = (
+    # Core indoor/outdoor
+    'indoors', 'outdoors', 'bedroom', 'bathroom', 'kitchen', 'living_room', 'classroom',
+    'hallway', 'rooftop', 'balcony', 'office', 'library', 'hospital', 'church', 'temple',
+    'shrine', 'castle', 'dungeon', 'cave', 'ruins', 'alley', 'street', 'city', 'town',
+    'village', 'park', 'garden', 'forest', 'jungle', 'mountain', 'hill', 'cliff',
+    'beach', 'ocean', 'sea', 'lake', 'river', 'waterfall', 'pool', 'hot_spring',
+    'desert', 'snow', 'field', 'meadow', 'farm', 'bridge', 'train', 'bus', 'car_interior',
+    'space', 'underwater', 'sky', 'cloud', 'sunset', 'sunrise', 'night', 'day',
+    'evening', 'morning', 'twilight', 'rain', 'snowing', 'fog', 'storm',
+    'starry_sky', 'moonlight', 'sunlight', 'shade', 'dark', 'bright',
+    'bed', 'couch', 'chair', 'desk', 'table', 'window', 'door', 'stairs',
+    'cafe', 'restaurant', 'bar_(place)', 'shop', 'market', 'stadium', 'arena',
+    'stage', 'gym', 'dojo', 'laboratory', 'prison', 'throne_room', 'tent', 'campfire',
+    # Indoor locations
+    'attic', 'basement', 'lobby', 'corridor', 'locker_room', 'closet', 'pantry',
+    'laundry_room', 'greenhouse', 'garage', 'warehouse', 'factory', 'studio',
+    'theater', 'cinema', 'museum', 'gallery', 'hotel_room', 'elevator', 'staircase',
+    'auditorium', 'chapel', 'infirmary', 'changing_room', 'fitting_room',
+    'cockpit', 'control_room', 'server_room', 'recording_studio',
+    'hot_tub', 'sauna', 'onsen', 'spa',
+    # Outdoor locations
+    'highway', 'parking_lot', 'pier', 'dock', 'harbor', 'port', 'airport',
+    'train_station', 'bus_stop', 'cemetery', 'graveyard', 'amusement_park',
+    'zoo', 'aquarium', 'observatory', 'lighthouse', 'dam', 'canal',
+    'swamp', 'marsh', 'bog', 'tundra', 'savanna', 'volcano', 'canyon',
+    'valley', 'plateau', 'island', 'coast', 'shore', 'riverbank',
+    'fountain', 'courtyard', 'plaza', 'alleyway', 'overpass', 'tunnel',
+    'construction_site', 'junkyard', 'landfill', 'quarry', 'mine',
+    'vineyard', 'orchard', 'rice_field', 'wheat_field',
+    'playground', 'schoolyard', 'sports_field', 'track_and_field',
+    'skating_rink', 'ski_resort', 'campsite', 'picnic',
+    'crosswalk', 'sidewalk', 'road', 'path', 'trail',
+    'flower_field', 'bamboo_forest', 'cherry_blossoms',
+    'pagoda', 'mosque', 'cathedral', 'monastery', 'tower',
+    'skyscraper', 'apartment', 'building', 'house', 'hut', 'cabin',
+    'treehouse', 'gazebo', 'pavilion', 'veranda', 'porch', 'patio',
+    'rooftop_garden', 'conservatory',
+    # Weather/atmosphere
+    'blizzard', 'hail', 'thunder', 'lightning', 'overcast', 'clear_sky',
+    'mist', 'haze', 'dust', 'sandstorm', 'rainbow', 'aurora',
+    'cloudy_sky', 'cloudy', 'rainy', 'windy', 'wind',
+    'sunny', 'partly_cloudy', 'heavy_rain', 'drizzle',
+    'snowflakes', 'snowstorm', 'typhoon', 'hurricane', 'tornado',
+    'meteor', 'shooting_star', 'comet', 'eclipse',
+    'dusk', 'dawn', 'midnight', 'noon', 'afternoon',
+    'crescent_moon', 'full_moon', 'half_moon', 'new_moon',
+    'sun', 'moon', 'stars', 'constellation',
+    'autumn_leaves', 'falling_leaves', 'petals', 'falling_petals',
+    'cherry_blossom_petals', 'snow_on_ground',
+    # Lighting
+    'candlelight', 'lantern', 'neon_lights', 'fluorescent',
+    'spotlight', 'backlight', 'backlighting', 'dramatic_lighting',
+    'rim_lighting', 'lens_flare', 'god_rays', 'crepuscular_rays',
+    'soft_lighting', 'harsh_lighting', 'dim_lighting',
+    'light_rays', 'light_beam', 'light_particles',
+    'shadow', 'silhouette', 'reflection', 'glowing',
+    'fire', 'bonfire', 'torch', 'lamp', 'chandelier',
+    'streetlight', 'street_lamp', 'light_bulb',
+    'fireflies', 'bioluminescence',
+    # Furniture/features
+    'fireplace', 'bookshelf', 'counter', 'sink', 'bathtub', 'shower',
+    'mirror', 'curtain', 'curtains', 'rug', 'carpet',
+    'sofa', 'armchair', 'bench', 'stool', 'throne',
+    'altar', 'podium', 'lectern', 'blackboard', 'chalkboard', 'whiteboard',
+    'television', 'computer', 'monitor', 'screen', 'projector',
+    'piano', 'organ', 'statue', 'pillar', 'column',
+    'arch', 'gate', 'fence', 'wall', 'ceiling', 'floor',
+    'tile_floor', 'wooden_floor', 'tatami', 'futon',
+    'clock', 'vase', 'painting_(object)', 'picture_frame',
+    'shelf', 'drawer', 'cabinet', 'wardrobe', 'chest',
+    'barrel', 'crate', 'box', 'basket',
+    # Scenery/nature
+    'tree', 'trees', 'bush', 'grass', 'moss', 'ivy',
+    'flower', 'flowers', 'rose', 'sunflower', 'lily', 'lotus',
+    'mushroom', 'coral', 'seaweed', 'kelp',
+    'rock', 'boulder', 'pebble', 'sand', 'dirt', 'mud',
+    'ice', 'icicle', 'glacier', 'iceberg',
+    'lava', 'magma', 'geyser', 'hot_springs',
+    'pond', 'stream', 'creek', 'rapids', 'tide_pool',
+    'wave', 'waves', 'splash', 'ripple', 'foam',
+    'cave_interior', 'stalactite', 'stalagmite',
+    # Sky states
+    'blue_sky', 'orange_sky', 'red_sky', 'purple_sky', 'pink_sky',
+    'night_sky', 'gradient_sky',
+    'horizon', 'cityscape', 'landscape', 'scenery',
+    'nature', 'wilderness',
+)
+BACKGROUND_CANDIDATES_SET = frozenset(BACKGROUND_CANDIDATES)
+assert len(BACKGROUND_CANDIDATES_SET) == len(BACKGROUND_CANDIDATES), "duplicate entry in BACKGROUND_CANDIDATES"
 
 
 def generate_background_tags(valid_tags):
@@ -112,97 +592,39 @@ def generate_background_tags(valid_tags):
     Generate expanded BACKGROUND_TAGS.
     Only includes tags that exist in valid_tags.
 
-    To add new background/scene tags, append them to the candidates list below.
+    To add new background/scene tags, append them to BACKGROUND_CANDIDATES.
     """
-    candidates = [
-        # Core indoor/outdoor
-        'indoors', 'outdoors', 'bedroom', 'bathroom', 'kitchen', 'living_room', 'classroom',
-        'hallway', 'rooftop', 'balcony', 'office', 'library', 'hospital', 'church', 'temple',
-        'shrine', 'castle', 'dungeon', 'cave', 'ruins', 'alley', 'street', 'city', 'town',
-        'village', 'park', 'garden', 'forest', 'jungle', 'mountain', 'hill', 'cliff',
-        'beach', 'ocean', 'sea', 'lake', 'river', 'waterfall', 'pool', 'hot_spring',
-        'desert', 'snow', 'field', 'meadow', 'farm', 'bridge', 'train', 'bus', 'car_interior',
-        'space', 'underwater', 'sky', 'cloud', 'sunset', 'sunrise', 'night', 'day',
-        'evening', 'morning', 'twilight', 'rain', 'snowing', 'fog', 'storm',
-        'starry_sky', 'moonlight', 'sunlight', 'shade', 'dark', 'bright',
-        'bed', 'couch', 'chair', 'desk', 'table', 'window', 'door', 'stairs',
-        'cafe', 'restaurant', 'bar_(place)', 'shop', 'market', 'stadium', 'arena',
-        'stage', 'gym', 'dojo', 'laboratory', 'prison', 'throne_room', 'tent', 'campfire',
-        # Indoor locations
-        'attic', 'basement', 'lobby', 'corridor', 'locker_room', 'closet', 'pantry',
-        'laundry_room', 'greenhouse', 'garage', 'warehouse', 'factory', 'studio',
-        'theater', 'cinema', 'museum', 'gallery', 'hotel_room', 'elevator', 'staircase',
-        'auditorium', 'chapel', 'infirmary', 'changing_room', 'fitting_room',
-        'cockpit', 'control_room', 'server_room', 'recording_studio',
-        'hot_tub', 'sauna', 'onsen', 'spa',
-        # Outdoor locations
-        'highway', 'parking_lot', 'pier', 'dock', 'harbor', 'port', 'airport',
-        'train_station', 'bus_stop', 'cemetery', 'graveyard', 'amusement_park',
-        'zoo', 'aquarium', 'observatory', 'lighthouse', 'dam', 'canal',
-        'swamp', 'marsh', 'bog', 'tundra', 'savanna', 'volcano', 'canyon',
-        'valley', 'plateau', 'island', 'coast', 'shore', 'riverbank',
-        'fountain', 'courtyard', 'plaza', 'alleyway', 'overpass', 'tunnel',
-        'construction_site', 'junkyard', 'landfill', 'quarry', 'mine',
-        'vineyard', 'orchard', 'rice_field', 'wheat_field',
-        'playground', 'schoolyard', 'sports_field', 'track_and_field',
-        'skating_rink', 'ski_resort', 'campsite', 'picnic',
-        'crosswalk', 'sidewalk', 'road', 'path', 'trail',
-        'flower_field', 'bamboo_forest', 'cherry_blossoms',
-        'pagoda', 'mosque', 'cathedral', 'monastery', 'tower',
-        'skyscraper', 'apartment', 'building', 'house', 'hut', 'cabin',
-        'treehouse', 'gazebo', 'pavilion', 'veranda', 'porch', 'patio',
-        'rooftop_garden', 'conservatory',
-        # Weather/atmosphere
-        'blizzard', 'hail', 'thunder', 'lightning', 'overcast', 'clear_sky',
-        'mist', 'haze', 'dust', 'sandstorm', 'rainbow', 'aurora',
-        'cloudy_sky', 'cloudy', 'rainy', 'windy', 'wind',
-        'sunny', 'partly_cloudy', 'heavy_rain', 'drizzle',
-        'snowflakes', 'snowstorm', 'typhoon', 'hurricane', 'tornado',
-        'meteor', 'shooting_star', 'comet', 'eclipse',
-        'dusk', 'dawn', 'midnight', 'noon', 'afternoon',
-        'crescent_moon', 'full_moon', 'half_moon', 'new_moon',
-        'sun', 'moon', 'stars', 'constellation',
-        'autumn_leaves', 'falling_leaves', 'petals', 'falling_petals',
-        'cherry_blossom_petals', 'snow_on_ground',
-        # Lighting
-        'candlelight', 'lantern', 'neon_lights', 'fluorescent',
-        'spotlight', 'backlight', 'backlighting', 'dramatic_lighting',
-        'rim_lighting', 'lens_flare', 'god_rays', 'crepuscular_rays',
-        'soft_lighting', 'harsh_lighting', 'dim_lighting',
-        'light_rays', 'light_beam', 'light_particles',
-        'shadow', 'silhouette', 'reflection', 'glowing',
-        'fire', 'bonfire', 'torch', 'lamp', 'chandelier',
-        'streetlight', 'street_lamp', 'light_bulb',
-        'fireflies', 'bioluminescence',
-        # Furniture/features
-        'fireplace', 'bookshelf', 'counter', 'sink', 'bathtub', 'shower',
-        'mirror', 'curtain', 'curtains', 'rug', 'carpet', 'lamp',
-        'sofa', 'armchair', 'bench', 'stool', 'throne',
-        'altar', 'podium', 'lectern', 'blackboard', 'chalkboard', 'whiteboard',
-        'television', 'computer', 'monitor', 'screen', 'projector',
-        'piano', 'organ', 'fountain', 'statue', 'pillar', 'column',
-        'arch', 'gate', 'fence', 'wall', 'ceiling', 'floor',
-        'tile_floor', 'wooden_floor', 'tatami', 'futon',
-        'clock', 'vase', 'painting_(object)', 'picture_frame',
-        'shelf', 'drawer', 'cabinet', 'wardrobe', 'chest',
-        'barrel', 'crate', 'box', 'basket',
-        # Scenery/nature
-        'tree', 'trees', 'bush', 'grass', 'moss', 'ivy',
-        'flower', 'flowers', 'rose', 'sunflower', 'lily', 'lotus',
-        'mushroom', 'coral', 'seaweed', 'kelp',
-        'rock', 'boulder', 'pebble', 'sand', 'dirt', 'mud',
-        'ice', 'icicle', 'glacier', 'iceberg',
-        'lava', 'magma', 'geyser', 'hot_springs',
-        'pond', 'stream', 'creek', 'rapids', 'tide_pool',
-        'wave', 'waves', 'splash', 'ripple', 'foam',
-        'cave_interior', 'stalactite', 'stalagmite',
-        # Sky states
-        'blue_sky', 'orange_sky', 'red_sky', 'purple_sky', 'pink_sky',
-        'night_sky', 'gradient_sky',
-        'horizon', 'cityscape', 'landscape', 'scenery',
-        'nature', 'wilderness',
-    ]
-    return [t for t in candidates if t in valid_tags]
+    return _filter_candidates(BACKGROUND_CANDIDATES, BACKGROUND_CANDIDATES_SET, valid_tags)
+
+
+LOCATION_CANDIDATES = (
+    'indoors', 'outdoors', 'bedroom', 'bathroom', 'kitchen', 'living_room',
+    'classroom', 'hallway', 'rooftop', 'balcony', 'office', 'library',
+    'hospital', 'church', 'temple', 'shrine', 'castle', 'dungeon',
+    'cave', 'ruins', 'alley', 'street', 'city', 'town',
+    'village', 'park', 'garden', 'forest', 'jungle', 'mountain',
+    'hill', 'cliff', 'beach', 'ocean', 'lake', 'river',
+    'waterfall', 'pool', 'desert', 'field', 'meadow', 'farm',
+    'bridge', 'train', 'bus', 'car_interior', 'space', 'underwater',
+    'cafe', 'restaurant', 'bar_(place)', 'shop', 'market', 'stadium',
+    'arena', 'stage', 'gym', 'dojo', 'laboratory', 'prison',
+    'throne_room', 'tent', 'campfire', 'locker_room', 'closet', 'greenhouse',
+    'garage', 'warehouse', 'factory', 'studio', 'theater', 'museum',
+    'hotel_room', 'elevator', 'infirmary', 'changing_room', 'fitting_room',
+    'cockpit', 'recording_studio', 'sauna', 'onsen', 'highway', 'parking_lot',
+    'pier', 'dock', 'harbor', 'airport', 'train_station', 'bus_stop',
+    'graveyard', 'amusement_park', 'zoo', 'aquarium', 'lighthouse', 'canal',
+    'volcano', 'canyon', 'valley', 'island', 'shore', 'riverbank',
+    'fountain', 'overpass', 'tunnel', 'construction_site', 'junkyard',
+    'wheat_field', 'playground', 'track_and_field', 'skating_rink', 'picnic',
+    'crosswalk', 'sidewalk', 'road', 'path', 'flower_field', 'bamboo_forest',
+    'cherry_blossoms', 'pagoda', 'cathedral', 'tower', 'skyscraper', 'apartment',
+    'building', 'house', 'hut', 'cabin', 'treehouse', 'gazebo',
+    'veranda', 'porch', 'conservatory', 'cave_interior', 'ballroom',
+    'courtyard', 'plaza', 'monastery', 'corridor', 'lobby',
+)
+LOCATION_CANDIDATES_SET = frozenset(LOCATION_CANDIDATES)
+assert len(LOCATION_CANDIDATES_SET) == len(LOCATION_CANDIDATES), "duplicate entry in LOCATION_CANDIDATES"
 
 
 def generate_location_tags(valid_tags):
@@ -210,33 +632,26 @@ def generate_location_tags(valid_tags):
     Generate LOCATION_TAGS — places and structures.
     Only includes tags that exist in valid_tags.
     """
-    candidates = [
-        'indoors', 'outdoors', 'bedroom', 'bathroom', 'kitchen', 'living_room',
-        'classroom', 'hallway', 'rooftop', 'balcony', 'office', 'library',
-        'hospital', 'church', 'temple', 'shrine', 'castle', 'dungeon',
-        'cave', 'ruins', 'alley', 'street', 'city', 'town',
-        'village', 'park', 'garden', 'forest', 'jungle', 'mountain',
-        'hill', 'cliff', 'beach', 'ocean', 'lake', 'river',
-        'waterfall', 'pool', 'desert', 'field', 'meadow', 'farm',
-        'bridge', 'train', 'bus', 'car_interior', 'space', 'underwater',
-        'cafe', 'restaurant', 'bar_(place)', 'shop', 'market', 'stadium',
-        'arena', 'stage', 'gym', 'dojo', 'laboratory', 'prison',
-        'throne_room', 'tent', 'campfire', 'locker_room', 'closet', 'greenhouse',
-        'garage', 'warehouse', 'factory', 'studio', 'theater', 'museum',
-        'hotel_room', 'elevator', 'infirmary', 'changing_room', 'fitting_room',
-        'cockpit', 'recording_studio', 'sauna', 'onsen', 'highway', 'parking_lot',
-        'pier', 'dock', 'harbor', 'airport', 'train_station', 'bus_stop',
-        'graveyard', 'amusement_park', 'zoo', 'aquarium', 'lighthouse', 'canal',
-        'volcano', 'canyon', 'valley', 'island', 'shore', 'riverbank',
-        'fountain', 'overpass', 'tunnel', 'construction_site', 'junkyard',
-        'wheat_field', 'playground', 'track_and_field', 'skating_rink', 'picnic',
-        'crosswalk', 'sidewalk', 'road', 'path', 'flower_field', 'bamboo_forest',
-        'cherry_blossoms', 'pagoda', 'cathedral', 'tower', 'skyscraper', 'apartment',
-        'building', 'house', 'hut', 'cabin', 'treehouse', 'gazebo',
-        'veranda', 'porch', 'conservatory', 'cave_interior', 'ballroom',
-        'courtyard', 'plaza', 'monastery', 'corridor', 'lobby',
-    ]
-    return [t for t in candidates if t in valid_tags]
+    return _filter_candidates(LOCATION_CANDIDATES, LOCATION_CANDIDATES_SET, valid_tags)
+
+
+ATMOSPHERE_CANDIDATES = (
+    'rain', 'snowing', 'fog', 'storm', 'wind', 'blizzard', 'thunder',
+    'lightning', 'overcast', 'clear_sky', 'dust', 'sandstorm', 'rainbow',
+    'aurora', 'cloudy_sky', 'cloudy', 'snowflakes', 'snowstorm', 'tornado',
+    'meteor', 'shooting_star', 'comet', 'eclipse',
+    'candlelight', 'lantern', 'neon_lights', 'spotlight', 'backlighting',
+    'lens_flare', 'dim_lighting', 'light_rays', 'light_particles',
+    'shadow', 'silhouette', 'reflection', 'glowing', 'fire', 'bonfire',
+    'torch', 'lamp', 'chandelier', 'light_bulb', 'fireflies', 'bioluminescence',
+    'dappled_sunlight', 'sunbeam', 'sun_glare', 'hanging_light', 'stage_lights',
+    'underlighting', 'depth_of_field', 'dark_clouds',
+    'petals', 'falling_petals', 'falling_leaves', 'autumn_leaves',
+    'cherry_blossom_petals', 'snow',
+    'dark', 'bright', 'shade', 'moonlight', 'sunlight',
+)
+ATMOSPHERE_CANDIDATES_SET = frozenset(ATMOSPHERE_CANDIDATES)
+assert len(ATMOSPHERE_CANDIDATES_SET) == len(ATMOSPHERE_CANDIDATES), "duplicate entry in ATMOSPHERE_CANDIDATES"
 
 
 def generate_atmosphere_tags(valid_tags):
@@ -244,22 +659,19 @@ def generate_atmosphere_tags(valid_tags):
     Generate ATMOSPHERE_TAGS — weather, lighting, and atmospheric effects.
     Only includes tags that exist in valid_tags.
     """
-    candidates = [
-        'rain', 'snowing', 'fog', 'storm', 'wind', 'blizzard', 'thunder',
-        'lightning', 'overcast', 'clear_sky', 'dust', 'sandstorm', 'rainbow',
-        'aurora', 'cloudy_sky', 'cloudy', 'snowflakes', 'snowstorm', 'tornado',
-        'meteor', 'shooting_star', 'comet', 'eclipse',
-        'candlelight', 'lantern', 'neon_lights', 'spotlight', 'backlighting',
-        'lens_flare', 'dim_lighting', 'light_rays', 'light_particles',
-        'shadow', 'silhouette', 'reflection', 'glowing', 'fire', 'bonfire',
-        'torch', 'lamp', 'chandelier', 'light_bulb', 'fireflies', 'bioluminescence',
-        'dappled_sunlight', 'sunbeam', 'sun_glare', 'hanging_light', 'stage_lights',
-        'underlighting', 'depth_of_field', 'dark_clouds',
-        'petals', 'falling_petals', 'falling_leaves', 'autumn_leaves',
-        'cherry_blossom_petals', 'snow',
-        'dark', 'bright', 'shade', 'moonlight', 'sunlight',
-    ]
-    return [t for t in candidates if t in valid_tags]
+    return _filter_candidates(ATMOSPHERE_CANDIDATES, ATMOSPHERE_CANDIDATES_SET, valid_tags)
+
+
+TIME_CANDIDATES = (
+    'sunset', 'sunrise', 'night', 'day', 'evening', 'morning',
+    'twilight', 'dusk', 'dawn', 'midnight', 'noon', 'afternoon',
+    'starry_sky', 'night_sky', 'blue_sky', 'orange_sky', 'red_sky',
+    'purple_sky', 'pink_sky', 'gradient_sky',
+    'crescent_moon', 'full_moon', 'half_moon', 'sun', 'moon',
+    'constellation', 'golden_hour',
+)
+TIME_CANDIDATES_SET = frozenset(TIME_CANDIDATES)
+assert len(TIME_CANDIDATES_SET) == len(TIME_CANDIDATES), "duplicate entry in TIME_CANDIDATES"
 
 
 def generate_time_tags(valid_tags):
@@ -267,15 +679,87 @@ def generate_time_tags(valid_tags):
     Generate TIME_TAGS — time of day and sky states.
     Only includes tags that exist in valid_tags.
     """
-    candidates = [
-        'sunset', 'sunrise', 'night', 'day', 'evening', 'morning',
-        'twilight', 'dusk', 'dawn', 'midnight', 'noon', 'afternoon',
-        'starry_sky', 'night_sky', 'blue_sky', 'orange_sky', 'red_sky',
-        'purple_sky', 'pink_sky', 'gradient_sky',
-        'crescent_moon', 'full_moon', 'half_moon', 'sun', 'moon',
-        'constellation', 'golden_hour',
-    ]
-    return [t for t in candidates if t in valid_tags]
+    return _filter_candidates(TIME_CANDIDATES, TIME_CANDIDATES_SET, valid_tags)
+
+
+def copy_byte_range(src, dst, offset, count):
+    """
+    Copy count bytes starting at offset in file src to the end of file dst.
+
+    Uses os.sendfile so the data is copied inside the kernel, falling back to a
+    plain read/write where sendfile isn't available or fails for these files.
+    """
+    dst.flush()
+    if hasattr(os, 'sendfile'):
+        try:
+            while count > 0:
+                sent = os.sendfile(dst.fileno(), src.fileno(), offset, count)
+                if sent == 0:
+                    break
+                offset += sent
+                count -= sent
+        except OSError:
+            pass
+    if count > 0:
+        src.seek(offset)
+        dst.write(src.read(count))
+
+
+def find_sections(data):
+    """
+    Locate the regenerated sections in the raw bytes of index.js.
+
+    Each section is found by jumping straight to its 'const NAME = ...' line
+    and then to the first closing-delimiter line after it with bytes.find, so
+    the large tag bodies in between are only skimmed by memchr/memmem.
+    Returns {name: [start_line, end_line, start_offset, end_offset]}, where
+    the lines are 0-based and the offsets span from the start of the opener
+    line to just past the closer line. If an opener has no closer after it,
+    end_line and end_offset are None.
+    """
+    sections = {}
+    for name, (opener, closer) in SECTION_DELIMITERS.items():
+        start, start_end = _find_line(data, f"const {name} = {opener}".encode('ascii'), 0)
+        if start == -1:
+            continue
+        end, end_end = _find_line(data, closer.encode('ascii'), start_end)
+        if end == -1:
+            sections[name] = [start, None, start, None]
+            continue
+        sections[name] = [start, end, start, min(end_end + 1, len(data))]
+
+    # Convert the opener/closer offsets to line numbers in one forward pass
+    line_no = 0
+    last_pos = 0
+    line_of = {}
+    positions = {pos for section in sections.values() for pos in section[:2] if pos is not None}
+    for pos in sorted(positions):
+        line_no += data[last_pos:pos].count(b"\n")
+        last_pos = pos
+        line_of[pos] = line_no
+    for section in sections.values():
+        section[0] = line_of[section[0]]
+        section[1] = line_of.get(section[1])
+    return sections
+
+
+def _find_line(data, needle, pos):
+    """
+    Find the first line at or after pos that holds needle and nothing else but
+    blanks. Returns (line_start, line_end) offsets, line_end excluding the
+    newline, or (-1, -1) if there is none.
+    """
+    while True:
+        i = data.find(needle, pos)
+        if i == -1:
+            return -1, -1
+        line_start = data.rfind(b"\n", 0, i) + 1
+        line_end = data.find(b"\n", i)
+        if line_end == -1:
+            line_end = len(data)
+        if data[line_start:line_end].strip() == needle:
+            return line_start, line_end
+        pos = i + len(needle)
 
 
 def main():
@@ -283,21 +767,20 @@ def main():
     parser.add_argument('--csv', default=DEFAULT_CSV, help=f'Path to CSV file (default: {DEFAULT_CSV})')
     parser.add_argument('--threshold', type=int, default=100, help='Minimum post count (default: 100)')
     parser.add_argument('--dry-run', action='store_true', help='Print stats only, do not modify index.js')
+    parser.add_argument('--no-cache', action='store_true', help='Re-parse the CSV even if a cached result exists')
     args = parser.parse_args()
 
     print(f"Parsing {args.csv} (threshold: {args.threshold})...", file=sys.stderr)
-    tags = parse_csv(args.csv, args.threshold)
+    tags = parse_csv(args.csv, args.threshold, use_cache=not args.no_cache)
     print(f"Found {len(tags)} type-0 tags with {args.threshold}+ posts", file=sys.stderr)
 
     # Generate VALID_BOORU_TAGS
-    tag_names = set(tags.keys())
-    tags_lines = format_tags_set(tag_names)
+    tag_names = tags.keys()
+    sorted_tag_names = sorted(tag_names)
+    tags_body = format_tags_set_sorted(sorted_tag_names)
 
     # Generate TAG_ALIASES
-    aliases_dict = {}
-    for tag_name, info in tags.items():
-        for alias in info['aliases']:
-            aliases_dict[alias] = tag_name
+    aliases_dict = {alias: tag_name for tag_name, (_, aliases) in tags.items() for alias in aliases}
 
     print(f"Generated {len(aliases_dict)} alias mappings", file=sys.stderr)
 
@@ -316,148 +799,102 @@ def main():
         print("\n[DRY RUN] No changes written.", file=sys.stderr)
         return
 
-    # Read original index.js
-    with open(INDEX_JS_PATH, 'r', encoding='utf-8') as f:
-        lines = f.readlines()
-
-    # Find section markers dynamically
-    valid_tags_start = None
-    valid_tags_end = None
-    bg_tags_start = None
-    bg_tags_end = None
-    loc_tags_start = None
-    loc_tags_end = None
-    atm_tags_start = None
-    atm_tags_end = None
-    time_tags_start = None
-    time_tags_end = None
-    aliases_start = None
-    aliases_end = None
-
-    for i, line in enumerate(lines):
-        if "const VALID_BOORU_TAGS = new Set([" in line:
-            valid_tags_start = i
-        elif valid_tags_start is not None and valid_tags_end is None and line.strip() == "]);":
-            valid_tags_end = i
-        elif "const BACKGROUND_TAGS = new Set([" in line:
-            bg_tags_start = i
-        elif bg_tags_start is not None and bg_tags_end is None and line.strip() == "]);":
-            bg_tags_end = i
-        elif "const LOCATION_TAGS = new Set([" in line:
-            loc_tags_start = i
-        elif loc_tags_start is not None and loc_tags_end is None and line.strip() == "]);":
-            loc_tags_end = i
-        elif "const ATMOSPHERE_TAGS = new Set([" in line:
-            atm_tags_start = i
-        elif atm_tags_start is not None and atm_tags_end is None and line.strip() == "]);":
-            atm_tags_end = i
-        elif "const TIME_TAGS = new Set([" in line:
-            time_tags_start = i
-        elif time_tags_start is not None and time_tags_end is None and line.strip() == "]);":
-            time_tags_end = i
-        elif "const TAG_ALIASES = {" in line:
-            aliases_start = i
-        elif aliases_start is not None and aliases_end is None and line.strip() == "};":
-            aliases_end = i
-
-    required = [valid_tags_start, valid_tags_end, bg_tags_start, bg_tags_end,
-                loc_tags_start, loc_tags_end, atm_tags_start, atm_tags_end,
-                time_tags_start, time_tags_end, aliases_start, aliases_end]
-    if None in required:
+    # Map index.js read-only for the marker scan; its unchanged prefix and
+    # suffix are later copied file-to-file without passing through Python
+    try:
+        with open(INDEX_JS_PATH, 'rb') as f, \
+                mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as src:
+            sections = find_sections(src)
+            complete = all(
+                sections.get(name, [None, None])[1] is not None for name in SECTION_DELIMITERS
+            )
+            if complete:
+                # Everything before the VALID_BOORU_TAGS comment (1 line before
+                # the Set declaration) and after the TAG_ALIASES closing brace
+                valid_start = sections['VALID_BOORU_TAGS'][2]
+                prefix_end = src.rfind(b"\n", 0, max(valid_start - 1, 0)) + 1
+                suffix_start = sections['TAG_ALIASES'][3]
+                suffix_len = len(src) - suffix_start
+                # The prefix and suffix are copied verbatim, so the generated
+                # sections follow the line endings of the opener line
+                opener_end = src.find(b"\n", valid_start)
+                newline = "\r\n" if src[opener_end - 1:opener_end] == b"\r" else "\n"
+    except ValueError:
+        # Empty files can't be mapped and have no markers anyway
+        sections = {}
+        complete = False
+
+    if not complete:
         print("ERROR: Could not find all section markers in index.js", file=sys.stderr)
-        print(f"  VALID_BOORU_TAGS: {valid_tags_start}-{valid_tags_end}", file=sys.stderr)
-        print(f"  BACKGROUND_TAGS:  {bg_tags_start}-{bg_tags_end}", file=sys.stderr)
-        print(f"  LOCATION_TAGS:    {loc_tags_start}-{loc_tags_end}", file=sys.stderr)
-        print(f"  ATMOSPHERE_TAGS:  {atm_tags_start}-{atm_tags_end}", file=sys.stderr)
-        print(f"  TIME_TAGS:        {time_tags_start}-{time_tags_end}", file=sys.stderr)
-        print(f"  TAG_ALIASES:      {aliases_start}-{aliases_end}", file=sys.stderr)
+        for name in SECTION_DELIMITERS:
+            start_line, end_line = sections.get(name, [None, None])[:2]
+            print(f"  {name + ':':<18}{start_line}-{end_line}", file=sys.stderr)
         sys.exit(1)
 
     print(f"\nSection locations in index.js:", file=sys.stderr)
-    print(f"  VALID_BOORU_TAGS: lines {valid_tags_start+1}-{valid_tags_end+1}", file=sys.stderr)
-    print(f"  BACKGROUND_TAGS:  lines {bg_tags_start+1}-{bg_tags_end+1}", file=sys.stderr)
-    print(f"  LOCATION_TAGS:    lines {loc_tags_start+1}-{loc_tags_end+1}", file=sys.stderr)
-    print(f"  ATMOSPHERE_TAGS:  lines {atm_tags_start+1}-{atm_tags_end+1}", file=sys.stderr)
-    print(f"  TIME_TAGS:        lines {time_tags_start+1}-{time_tags_end+1}", file=sys.stderr)
-    print(f"  TAG_ALIASES:      lines {aliases_start+1}-{aliases_end+1}", file=sys.stderr)
-
-    def format_persistence_set(tags_list):
-        """Format persistence tags, 6 per line."""
-        result = []
-        for i in range(0, len(tags_list), 6):
-            chunk = tags_list[i:i+6]
-            entries = ", ".join(f"'{escape_js_string(t)}'" for t in chunk)
-            if i + 6 < len(tags_list):
-                result.append(f"    {entries},\n")
-            else:
-                result.append(f"    {entries}\n")
-        return result
-
-    # Build new file content
-    new_lines = []
-
-    # Everything before VALID_BOORU_TAGS comment (1 line before the Set declaration)
-    comment_line = valid_tags_start - 1
-    new_lines.extend(lines[:comment_line])
-
-    # VALID_BOORU_TAGS
-    new_lines.append(f"// Valid booru tags (extracted from danbooru dataset - category 0 tags with {args.threshold}+ posts)\n")
-    new_lines.append("const VALID_BOORU_TAGS = new Set([\n")
-    for i, tl in enumerate(tags_lines):
-        if i < len(tags_lines) - 1:
-            new_lines.append(tl + ",\n")
-        else:
-            new_lines.append(tl + "\n")
-    new_lines.append("]);\n")
-    new_lines.append("\n")
-
-    # BACKGROUND_TAGS
-    new_lines.append("// Scene Persistence: Background/setting tags (curated subset of VALID_BOORU_TAGS)\n")
-    new_lines.append("const BACKGROUND_TAGS = new Set([\n")
-    new_lines.extend(format_persistence_set(background_tags))
-    new_lines.append("]);\n")
-    new_lines.append("\n")
-
-    # LOCATION_TAGS
-    new_lines.append("// Scene Persistence: Location tags (curated subset of VALID_BOORU_TAGS)\n")
-    new_lines.append("const LOCATION_TAGS = new Set([\n")
-    new_lines.extend(format_persistence_set(location_tags))
-    new_lines.append("]);\n")
-    new_lines.append("\n")
-
-    # ATMOSPHERE_TAGS
-    new_lines.append("// Scene Persistence: Atmosphere/lighting tags (curated subset of VALID_BOORU_TAGS)\n")
-    new_lines.append("const ATMOSPHERE_TAGS = new Set([\n")
-    new_lines.extend(format_persistence_set(atmosphere_tags))
-    new_lines.append("]);\n")
-    new_lines.append("\n")
-
-    # TIME_TAGS
-    new_lines.append("// Scene Persistence: Time-of-day tags (curated subset of VALID_BOORU_TAGS)\n")
-    new_lines.append("const TIME_TAGS = new Set([\n")
-    new_lines.extend(format_persistence_set(time_tags))
-    new_lines.append("]);\n")
-    new_lines.append("\n")
-
-    # TAG_ALIASES
-    new_lines.append("// Alias corrections (extracted from danbooru - maps common variations to canonical booru tags)\n")
-    new_lines.append("const TAG_ALIASES = {\n")
-    alias_lines = format_aliases(aliases_dict)
-    for i, al in enumerate(alias_lines):
-        if i < len(alias_lines) - 1:
-            new_lines.append(al + ",\n")
-        else:
-            new_lines.append(al + "\n")
-    new_lines.append("};\n")
-
-    # Everything after TAG_ALIASES closing brace
-    new_lines.extend(lines[aliases_end + 1:])
-
-    # Write output
-    with open(INDEX_JS_PATH, 'w', encoding='utf-8') as f:
-        f.writelines(new_lines)
-
-    print(f"\nDone! Written {len(new_lines)} lines to {INDEX_JS_PATH}", file=sys.stderr)
+    for name, (start_line, end_line, _, _) in sections.items():
+        print(f"  {name + ':':<18}lines {start_line+1}-{end_line+1}", file=sys.stderr)
+
+    # Stream the new file content into a temporary file next to index.js and
+    # swap it in once complete, so an interrupted run never leaves a torn file
+    tmp_path = INDEX_JS_PATH + ".tmp"
+    try:
+        with open(INDEX_JS_PATH, 'rb') as src, \
+                open(tmp_path, 'wb', buffering=OUTPUT_BUFFER_SIZE) as f:
+            copy_byte_range(src, f, 0, prefix_end)
+
+            # The regenerated sections are assembled into one string and
+            # written with a single encode + write between the two copies
+            generated = "".join([
+                # VALID_BOORU_TAGS
+                f"// Valid booru tags (extracted from danbooru dataset - category 0 tags with {args.threshold}+ posts)\n",
+                "const VALID_BOORU_TAGS = new Set([\n",
+                tags_body,
+                "]);\n\n",
+
+                # BACKGROUND_TAGS
+                "// Scene Persistence: Background/setting tags (curated subset of VALID_BOORU_TAGS)\n",
+                "const BACKGROUND_TAGS = new Set([\n",
+                format_persistence_set(background_tags),
+                "]);\n\n",
+
+                # LOCATION_TAGS
+                "// Scene Persistence: Location tags (curated subset of VALID_BOORU_TAGS)\n",
+                "const LOCATION_TAGS = new Set([\n",
+                format_persistence_set(location_tags),
+                "]);\n\n",
+
+                # ATMOSPHERE_TAGS
+                "// Scene Persistence: Atmosphere/lighting tags (curated subset of VALID_BOORU_TAGS)\n",
+                "const ATMOSPHERE_TAGS = new Set([\n",
+                format_persistence_set(atmosphere_tags),
+                "]);\n\n",
+
+                # TIME_TAGS
+                "// Scene Persistence: Time-of-day tags (curated subset of VALID_BOORU_TAGS)\n",
+                "const TIME_TAGS = new Set([\n",
+                format_persistence_set(time_tags),
+                "]);\n\n",
+
+                # TAG_ALIASES
+                "// Alias corrections (extracted from danbooru - maps common variations to canonical booru tags)\n",
+                "const TAG_ALIASES = {\n",
+                format_aliases(aliases_dict),
+                "};\n",
+            ])
+            if newline != "\n":
+                generated = generated.replace("\n", newline)
+            f.write(generated.encode('utf-8'))
+
+            copy_byte_range(src, f, suffix_start, suffix_len)
+        shutil.copymode(INDEX_JS_PATH, tmp_path)
+        os.replace(tmp_path, INDEX_JS_PATH)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    print(f"\nDone! Written {os.path.getsize(INDEX_JS_PATH)} bytes to {INDEX_JS_PATH}", file=sys.stderr)
     print(f"  VALID_BOORU_TAGS: {len(tag_names)} entries", file=sys.stderr)
     print(f"  TAG_ALIASES:      {len(aliases_dict)} entries", file=sys.stderr)
     print(f"  BACKGROUND_TAGS:  {len(background_tags)} entries", file=sys.stderr)